@@ -1,54 +1,289 @@
 #!/usr/bin/env python3
 """QR Code Generator CLI - Compact version with full functionality."""
-import json, re, sys, click, qrcode, validators
-from datetime import datetime
+import functools, ipaddress, json, os, re, shlex, shutil, stat, sys, threading, time, click
 from pathlib import Path
 from urllib.parse import quote, urlencode
 
-HISTORY_FILE = Path.home() / ".qr-generator" / "history.json"
+HISTORY_FILE = Path.home() / ".qr-generator" / "history.jsonl"
+LEGACY_HISTORY_FILE = HISTORY_FILE.with_name("history.json")  # pre-JSONL {"entries": [...]} layout
+LEGACY_HISTORY_BACKUP = HISTORY_FILE.with_name("history.json.bak")  # unreadable legacy file, kept for the user
+_HISTORY_DIR_READY = False
+_HISTORY_BUFSIZE = 1 << 16  # binary I/O, no TextIOWrapper encode/newline layer
+try: HISTORY_MAX_BYTES = max(4096, int(os.environ.get("QR_HISTORY_MAX_BYTES", 1_600_000)))  # ~10,000 entries
+except ValueError: HISTORY_MAX_BYTES = 1_600_000
+_TAIL_BYTES_PER_ENTRY = 512  # initial tail window per requested entry; grown if it holds too few lines
+_PNG_FACTORY = _SVG_FACTORY = None
+_VERSION_CACHE = {}  # (error correction, chunk modes/lengths) -> minimal QR version
+_VERSION_CACHE_SIZE = 256
+_QR_CACHE = threading.local()
+_UNICODE_SPACES = (  # every str.isspace() character
+    "\t\n\v\f\r\x1c\x1d\x1e\x1f \x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+_PHONE_STRIP = str.maketrans("", "", "-.()" + _UNICODE_SPACES)
+_PHONE_MATCH = re.compile(r"\+?\d{7,15}")
+_DOMAIN = r"(?:(?:[^\W_](?:(?:[^\W_]|-){0,61}[^\W_])?\.)+(?:[^\W\d_]{2,63}|xn--[a-z0-9-]{1,59}))"
+_IPV4 = r"(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)"
+_PORT = r"(?:6553[0-5]|655[0-2]\d|65[0-4]\d\d|6[0-4]\d{3}|[1-5]\d{4}|\d{1,4})"
+_HOST = rf"(?:{_DOMAIN}|{_IPV4}|\[(?P<v6>[0-9a-f:.]+)\])"  # v6 is checked with ipaddress
+_URL_RE = re.compile(rf"https?://(?:[^\s:@/]+(?::[^\s@/]*)?@)?{_HOST}(?::{_PORT})?(?:[/?#]\S*)?", re.I)
+_EMAIL_RE = re.compile(rf"[a-z0-9!#$%&'*+/=?^_`{{|}}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{{|}}~-]+)*@{_DOMAIN}", re.I)
+_ALLOWED_SUFFIXES = frozenset((".png", ".svg"))
+_VALID_SEC = frozenset(("WPA", "WPA2", "WPA3", "WEP", "NOPASS"))
+_VALID_SEC_LIST = ", ".join(sorted(_VALID_SEC))
+_SEC_ALIASES = {"NONE": "NOPASS", "OPEN": "NOPASS"}
+_WIFI_ESCAPE = str.maketrans({"\\": "\\\\", ";": "\\;", ",": "\\,", '"': '\\"', ":": "\\:"})
 
 class ValidationError(Exception): pass
 
-def validate_output(path):
-    p = Path(path).expanduser().resolve()
-    if p.suffix.lower() not in (".png", ".svg"):
+_dumps = _loads = None
+
+def _json_codec():
+    """Pick the history codec on first use: orjson when installed (the "fast" extra), else compact stdlib json."""
+    global _dumps, _loads
+    if _dumps is not None: return
+    std_dumps = lambda obj: json.dumps(obj, separators=(",", ":")).encode()
+    try: import orjson
+    except ImportError:
+        _dumps, _loads = std_dumps, json.loads
+        return
+    def _dumps(obj):  # orjson rejects lone surrogates, e.g. from non-UTF-8 filenames
+        try: return orjson.dumps(obj)
+        except TypeError: return std_dumps(obj)
+    def _loads(data):
+        try: return orjson.loads(data)
+        except ValueError: return json.loads(data)
+
+def validate_output(path, fmt=None):
+    """Resolve `path` and return it with the extension of the format actually written."""
+    path = os.fspath(path)
+    suffix = path[path.rfind("."):].lower()  # cheap reject before any Path work
+    if suffix not in _ALLOWED_SUFFIXES:
         raise ValidationError("Output must be .png or .svg")
-    if not p.parent.exists():
-        raise ValidationError(f"Directory does not exist: {p.parent}")
-    return p
+    p = Path(path).expanduser().absolute()  # no per-component lstat; the parent check below is what matters
+    if p.suffix.lower() != suffix:  # e.g. a bare ".png" is a hidden file with no extension
+        raise ValidationError("Output must be .png or .svg")
+    try: st = os.stat(p.parent)
+    except (FileNotFoundError, NotADirectoryError):
+        raise ValidationError(f"Directory does not exist: {p.parent}") from None
+    if not stat.S_ISDIR(st.st_mode): raise ValidationError(f"Not a directory: {p.parent}")
+    if not os.access(p.parent, os.W_OK): raise ValidationError(f"Directory is not writable: {p.parent}")
+    desired = f".{fmt}" if fmt else suffix
+    return p if p.suffix == desired else p.with_suffix(desired)
 
 def validate_url(url):
     if not url.startswith(("http://", "https://")): url = f"https://{url}"
-    if not validators.url(url): raise ValidationError(f"Invalid URL: {url}")
+    m = _URL_RE.fullmatch(url)
+    if m and m["v6"]:
+        try: ipaddress.IPv6Address(m["v6"])
+        except ValueError: m = None
+    if not m: raise ValidationError(f"Invalid URL: {url}")
     return url
 
 def validate_email(email):
-    if not validators.email(email): raise ValidationError(f"Invalid email: {email}")
+    if not _EMAIL_RE.fullmatch(email): raise ValidationError(f"Invalid email: {email}")
     return email
 
 def validate_phone(phone):
-    normalized = re.sub(r"[\s\-\.\(\)]", "", phone)
-    if not re.match(r"^\+?\d{7,15}$", normalized): raise ValidationError(f"Invalid phone: {phone}")
+    normalized = phone.translate(_PHONE_STRIP)
+    if not _PHONE_MATCH.fullmatch(normalized): raise ValidationError(f"Invalid phone: {phone}")
     return normalized
 
+@functools.lru_cache(maxsize=256)
+def format_wifi(ssid, password, sec):
+    head = f"WIFI:T:{sec};S:{ssid.translate(_WIFI_ESCAPE)};"
+    return f"{head};" if sec == "NOPASS" else f"{head}P:{password.translate(_WIFI_ESCAPE)};;"
+
+@functools.lru_cache(maxsize=128)
+def format_vcard(name, phone=None, email=None, org=None):
+    parts = [f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}"]
+    if phone: parts.append(f"TEL:{phone}")
+    if email: parts.append(f"EMAIL:{email}")
+    if org: parts.append(f"ORG:{org}")
+    parts.append("END:VCARD")
+    return "\n".join(parts)
+
+@functools.lru_cache(maxsize=256)
+def format_email(address, subject=None, body=None):
+    params = {k: v for k, v in (("subject", subject), ("body", body)) if v}
+    return f"mailto:{address}?{urlencode(params, quote_via=quote)}" if params else f"mailto:{address}"
+
+@functools.lru_cache(maxsize=256)
+def format_sms(phone, message=None):
+    return f"sms:{phone}?body={quote(message)}" if message else f"sms:{phone}"
+
+def _image_factory(fmt):
+    """Import the qrcode image backend for `fmt` on first use and cache it."""
+    global _PNG_FACTORY, _SVG_FACTORY
+    if fmt == "svg":
+        if _SVG_FACTORY is None:
+            from qrcode.image.svg import SvgPathImage
+            _SVG_FACTORY = SvgPathImage
+        return _SVG_FACTORY
+    if _PNG_FACTORY is None:
+        from qrcode.image.pil import PilImage
+        _PNG_FACTORY = PilImage
+    return _PNG_FACTORY
+
 def generate(data, output, fmt=None):
-    p = validate_output(output)
-    fmt = fmt or p.suffix.lower().lstrip(".")
-    qr = qrcode.QRCode(box_size=10, border=4)
+    p = validate_output(output, fmt)
+    fmt = p.suffix[1:]
+    qr = getattr(_QR_CACHE, "qr", None)
+    if qr is None:
+        import qrcode
+        qr = _QR_CACHE.qr = qrcode.QRCode(box_size=10, border=4)
+    else:
+        qr.clear()
+        qr.version = None  # clear() keeps the old version, which best_fit would use as its starting point
     qr.add_data(data)
-    qr.make(fit=True)
+    # The minimal version depends only on each chunk's mode and length, so repeat shapes skip best_fit.
+    key = (qr.error_correction, tuple((d.mode, len(d)) for d in qr.data_list))
+    version = _VERSION_CACHE.get(key)
+    if version is None:
+        qr.make(fit=True)
+        if len(_VERSION_CACHE) >= _VERSION_CACHE_SIZE: del _VERSION_CACHE[next(iter(_VERSION_CACHE))]
+        _VERSION_CACHE[key] = qr.version
+    else:
+        qr.version = version
+        qr.make(fit=False)
     if fmt == "svg":
-        from qrcode.image.svg import SvgPathImage
-        qr.make_image(image_factory=SvgPathImage).save(str(p.with_suffix(".svg")))
+        qr.make_image(image_factory=_image_factory("svg")).save(p)
     else:
-        qr.make_image(fill_color="black", back_color="white").save(str(p.with_suffix(".png")))
+        # Two-colour images barely shrink past zlib level 1, which encodes several times faster than the default 6.
+        img = qr.make_image(image_factory=_image_factory("png"), fill_color="black", back_color="white")
+        img.save(p, optimize=False, compress_level=1)
     return p
 
+def _argv_command(secret=()):
+    """The invoking command line, shell-quoted, with the values of `secret` options masked."""
+    parts, mask = [], False
+    for a in sys.argv[1:]:
+        if mask: a, mask = "****", False
+        elif a in secret: mask = True
+        elif secret and a.startswith(secret):
+            opt = next(o for o in secret if a.startswith(o))
+            a = f"{opt}=****" if opt.startswith("--") else f"{opt}****"
+        else: a = shlex.quote(a)
+        parts.append(a)
+    return "qr " + " ".join(parts)
+
+def _migrate_legacy_history():
+    """Fold a pre-JSONL history.json into the log; the history directory must exist."""
+    if not LEGACY_HISTORY_FILE.exists(): return
+    _json_codec()
+    try:
+        entries = _loads(LEGACY_HISTORY_FILE.read_bytes()).get("entries", [])
+        if not isinstance(entries, list): raise ValueError("'entries' is not a list")
+    except (ValueError, AttributeError):
+        os.replace(LEGACY_HISTORY_FILE, LEGACY_HISTORY_BACKUP)
+        click.secho(f"Warning: could not read old history; kept it as {LEGACY_HISTORY_BACKUP}", fg="yellow", err=True)
+        return
+    _rewrite_history([_dumps(e) + b"\n" for e in entries if isinstance(e, dict)], keep_from=0)
+    LEGACY_HISTORY_FILE.unlink()
+
+def _rewrite_history(chunks, keep_from=None):
+    """Atomically replace the log with `chunks` plus the current log from byte `keep_from` on.
+
+    Uses tmp file, fsync, os.replace; plain appends skip fsync on purpose. The kept tail is copied
+    at rewrite time, so only an append landing between that copy and os.replace can be lost.
+    """
+    tmp = HISTORY_FILE.with_suffix(".jsonl.tmp")
+    with open(tmp, "wb", buffering=_HISTORY_BUFSIZE) as f:
+        f.writelines(chunks)
+        if keep_from is not None:
+            try:
+                with open(HISTORY_FILE, "rb") as src:
+                    src.seek(keep_from)
+                    shutil.copyfileobj(src, f, _HISTORY_BUFSIZE)
+            except FileNotFoundError: pass
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, HISTORY_FILE)
+
+def _ensure_history_dir():
+    """Create the history directory (and migrate legacy history) at most once per process."""
+    global _HISTORY_DIR_READY
+    if _HISTORY_DIR_READY: return
+    HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+    _migrate_legacy_history()
+    _HISTORY_DIR_READY = True
+
 def save_history(qr_type, cmd, output):
-    HISTORY_FILE.parent.mkdir(exist_ok=True)
-    data = json.loads(HISTORY_FILE.read_text()) if HISTORY_FILE.exists() else {"entries": []}
-    data["entries"].append({"type": qr_type, "command": cmd, "output": str(output), "time": datetime.now().isoformat()})
-    HISTORY_FILE.write_text(json.dumps(data, indent=2))
+    """Append one entry to the JSONL history log."""
+    save_history_entries([(qr_type, cmd, output)])
+
+def _now_iso():
+    """Local time in datetime.now().isoformat() form, without building a datetime."""
+    t = time.time()
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(t)) + f".{int(t % 1 * 1e6):06d}"
+
+def save_history_entries(items):
+    """Append (type, command, output) entries to the log with a single write and one shared timestamp."""
+    if not items: return
+    _ensure_history_dir()
+    _json_codec()
+    now = _now_iso()
+    data = b"".join(_dumps({"type": t, "command": c, "output": str(o), "time": now}) + b"\n" for t, c, o in items)
+    with open(HISTORY_FILE, "a+b", buffering=_HISTORY_BUFSIZE) as f:
+        if f.tell():  # appends skip fsync, so a torn last line must not swallow this entry
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n": data = b"\n" + data
+        f.write(data)
+        size = f.tell()
+    if size > HISTORY_MAX_BYTES: _trim_history(size)
+
+def _trim_history(size):
+    """Keep roughly the newest half of the log, cut at a line boundary, once it outgrows HISTORY_MAX_BYTES."""
+    with open(HISTORY_FILE, "rb") as f:
+        f.seek(max(0, size - HISTORY_MAX_BYTES // 2))
+        f.readline()  # finish the line the cut landed in
+        start = f.tell()
+        if start >= size: start = _last_line_start(f, size)  # the newest entry alone overflows the half budget
+    if start: _rewrite_history([], keep_from=start)
+
+def _last_line_start(f, size):
+    """Offset of the final line of a log of `size` bytes that ends with a newline."""
+    end = size - 1
+    while end > 0:
+        pos = max(0, end - _HISTORY_BUFSIZE)
+        f.seek(pos)
+        nl = f.read(end - pos).rfind(b"\n")
+        if nl >= 0: return pos + nl + 1
+        end = pos
+    return 0
+
+def load_history(limit=None):
+    """Return the last `limit` entries (all if None), oldest first, reading only the file tail when possible."""
+    if not _HISTORY_DIR_READY and LEGACY_HISTORY_FILE.exists(): _ensure_history_dir()  # reads never need mkdir
+    try: size = os.stat(HISTORY_FILE).st_size
+    except FileNotFoundError: return []
+    _json_codec()
+    with open(HISTORY_FILE, "rb", buffering=_HISTORY_BUFSIZE) as f:
+        window = limit * _TAIL_BYTES_PER_ENTRY if limit else size
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            entries = _decode_lines(f.read(size - start).split(b"\n")[1 if start else 0:])  # first piece may be partial
+            if not start or len(entries) >= limit: break
+            window *= 4
+    return entries[-limit:] if limit else entries
+
+def _decode_lines(lines):
+    """Decode JSONL lines, skipping blank, torn or corrupt ones."""
+    entries = []
+    for l in lines:
+        if not l.strip(): continue
+        try: e = _loads(l)
+        except ValueError: continue
+        if isinstance(e, dict): entries.append(e)
+    return entries
+
+def format_history(entries):
+    """Render entries newest first as numbered blocks, in one string for a single write."""
+    return "".join(
+        f"[{i}] {e.get('time', '')[:19].replace('T', ' ')} - {e.get('type')}\n    {e.get('command')}\n\n"
+        for i, e in enumerate(reversed(entries), 1))
 
 def error(msg):
     click.secho(f"Error: {msg}", fg="red", err=True)
@@ -58,117 +293,174 @@ def error(msg):
 @click.version_option("1.0.0")
 def cli(): """QR Code Generator - All commands require --output (-o)."""
 
-@cli.command()
-@click.argument("url")
-@click.option("-o", "--output", required=True)
-@click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"]))
-def url(url, output, fmt):
-    """Generate QR for a URL."""
-    try:
-        url = validate_url(url)
-        p = generate(url, output, fmt)
-        save_history("url", f'qr url "{url}" -o {output}', p)
-        click.secho(f"✓ {p}", fg="green")
-    except (ValidationError, Exception) as e: error(e)
+def _text_payload(text):
+    if not text: raise ValidationError("Text cannot be empty")
+    return text
 
-@cli.command()
-@click.argument("text")
-@click.option("-o", "--output", required=True)
-@click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"]))
-def text(text, output, fmt):
-    """Generate QR for plain text."""
-    try:
-        if not text: raise ValidationError("Text cannot be empty")
-        p = generate(text, output, fmt)
-        save_history("text", f'qr text "{text[:50]}" -o {output}', p)
-        click.secho(f"✓ {p}", fg="green")
-    except (ValidationError, Exception) as e: error(e)
+def _wifi_payload(ssid, password, security):
+    sec = security.upper()
+    sec = _SEC_ALIASES.get(sec, sec)
+    if sec not in _VALID_SEC: raise ValidationError(f"Invalid security: {security}. Use one of {_VALID_SEC_LIST}.")
+    if sec != "NOPASS" and not password: raise ValidationError("Password required for secured networks")
+    return format_wifi(ssid, password, sec)
 
-@cli.command()
-@click.option("-s", "--ssid", required=True)
-@click.option("-p", "--password", required=True)
-@click.option("-t", "--security", default="WPA")
-@click.option("-o", "--output", required=True)
-@click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"]))
-def wifi(ssid, password, security, output, fmt):
-    """Generate QR for WiFi credentials."""
-    try:
-        sec = security.upper()
-        if sec not in ("WPA", "WPA2", "WPA3", "WEP", "NOPASS"): raise ValidationError(f"Invalid security: {security}")
-        if sec != "NOPASS" and not password: raise ValidationError("Password required for secured networks")
-        esc = lambda s: s.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace(":", "\\:")
-        data = f"WIFI:T:{sec};S:{esc(ssid)};P:{esc(password)};;"
-        p = generate(data, output, fmt)
-        save_history("wifi", f'qr wifi -s "{ssid}" -p **** -t {sec} -o {output}', p)
-        click.secho(f"✓ {p}", fg="green")
-    except (ValidationError, Exception) as e: error(e)
+def _vcard_payload(name, phone=None, email=None, org=None):
+    return format_vcard(name, phone and validate_phone(phone), email and validate_email(email), org)
 
-@cli.command()
-@click.option("-n", "--name", required=True)
-@click.option("-p", "--phone")
-@click.option("-e", "--email")
-@click.option("--org")
-@click.option("-o", "--output", required=True)
-@click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"]))
-def vcard(name, phone, email, org, output, fmt):
-    """Generate QR for a contact card."""
-    try:
-        lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{name}"]
-        if phone: lines.append(f"TEL:{validate_phone(phone)}")
-        if email: lines.append(f"EMAIL:{validate_email(email)}")
-        if org: lines.append(f"ORG:{org}")
-        lines.append("END:VCARD")
-        p = generate("\n".join(lines), output, fmt)
-        save_history("vcard", f'qr vcard -n "{name}" -o {output}', p)
-        click.secho(f"✓ {p}", fg="green")
-    except (ValidationError, Exception) as e: error(e)
+def _email_payload(address, subject=None, body=None):
+    return format_email(validate_email(address), subject, body)
 
-@cli.command()
-@click.argument("address")
-@click.option("-s", "--subject")
-@click.option("-b", "--body")
-@click.option("-o", "--output", required=True)
-@click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"]))
-def email(address, subject, body, output, fmt):
-    """Generate QR for an email address."""
-    try:
-        address = validate_email(address)
-        params = {k: v for k, v in [("subject", subject), ("body", body)] if v}
-        data = f"mailto:{address}?{urlencode(params, quote_via=quote)}" if params else f"mailto:{address}"
-        p = generate(data, output, fmt)
-        save_history("email", f'qr email "{address}" -o {output}', p)
-        click.secho(f"✓ {p}", fg="green")
-    except (ValidationError, Exception) as e: error(e)
+def _sms_payload(phone, message=None):
+    return format_sms(validate_phone(phone), message)
+
+# name -> (help, payload builder taking the command's own params, params, options whose values history masks)
+_COMMANDS = {
+    "url": ("Generate QR for a URL.", validate_url, [click.argument("url")], ()),
+    "text": ("Generate QR for plain text.", _text_payload, [click.argument("text")], ()),
+    "wifi": ("Generate QR for WiFi credentials.", _wifi_payload, [
+        click.option("-s", "--ssid", required=True),
+        click.option("-p", "--password", required=True),
+        click.option("-t", "--security", default="WPA"),
+    ], ("-p", "--password")),
+    "vcard": ("Generate QR for a contact card.", _vcard_payload, [
+        click.option("-n", "--name", required=True),
+        click.option("-p", "--phone"),
+        click.option("-e", "--email"),
+        click.option("--org"),
+    ], ()),
+    "email": ("Generate QR for an email address.", _email_payload, [
+        click.argument("address"),
+        click.option("-s", "--subject"),
+        click.option("-b", "--body"),
+    ], ()),
+    "sms": ("Generate QR for SMS.", _sms_payload, [click.argument("phone"), click.option("-m", "--message")], ()),
+}
+_OUTPUT_PARAMS = [
+    click.option("-o", "--output", required=True),
+    click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"])),
+]
+
+def _make_handler(name, payload, params, secret):
+    def handler(output, fmt, **kwargs):
+        try:
+            p = generate(payload(**kwargs), output, fmt)
+            save_history(name, _argv_command(secret), p)
+            click.secho(f"✓ {p}", fg="green")
+        except Exception as e: error(e)
+    return functools.reduce(lambda f, deco: deco(f), reversed(params + _OUTPUT_PARAMS), handler)
+
+for _name, (_help, *_spec) in _COMMANDS.items():
+    cli.command(_name, help=_help)(_make_handler(_name, *_spec))
+
+_BATCH_TYPES = ("url", "text", "email", "sms")
+
+def _batch_one(job):
+    qr_type, value, output, fmt = job
+    try: return generate(_COMMANDS[qr_type][1](value), output, fmt), None
+    except Exception as e: return None, str(e)
 
 @cli.command()
-@click.argument("phone")
-@click.option("-m", "--message")
-@click.option("-o", "--output", required=True)
-@click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"]))
-def sms(phone, message, output, fmt):
-    """Generate QR for SMS."""
-    try:
-        phone = validate_phone(phone)
-        data = f"sms:{phone}?body={quote(message)}" if message else f"sms:{phone}"
-        p = generate(data, output, fmt)
-        save_history("sms", f'qr sms "{phone}" -o {output}', p)
+@click.option("-t", "--type", "qr_type", required=True, type=click.Choice(_BATCH_TYPES))
+@click.option("-d", "--output-dir", required=True)
+@click.option("-f", "--format", "fmt", type=click.Choice(["png", "svg"]), default="png")
+@click.option("-j", "--workers", type=click.IntRange(min=1), default=1)
+def batch(qr_type, output_dir, fmt, workers):
+    """Generate one QR per non-blank stdin line N as DIR/NNNN.png (line 1 -> 0001.png, ...)."""
+    out_dir = Path(output_dir).expanduser()
+    if not out_dir.is_dir(): error(f"Directory does not exist: {out_dir}")
+    lines = []  # (stdin line number, text or None when not UTF-8)
+    for n, raw in enumerate(sys.stdin.buffer, 1):
+        try: line = raw.decode().rstrip("\r\n")
+        except UnicodeDecodeError: line = None
+        if line is None or line.strip(): lines.append((n, line))
+    jobs = [(qr_type, v, out_dir / f"{n:04d}.{fmt}", fmt) for n, v in lines if v is not None]
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool: results = iter(pool.map(_batch_one, jobs, chunksize=16))
+    else: results = map(_batch_one, jobs)
+    done, failed = [], 0
+    for n, value in lines:
+        p, err = next(results) if value is not None else (None, "not valid UTF-8")
+        if err:
+            failed += 1
+            click.secho(f"Error: line {n}: {err}", fg="red", err=True)
+            continue
+        done.append((qr_type, "qr " + shlex.join((qr_type, value, "-o", str(p))), p))
         click.secho(f"✓ {p}", fg="green")
-    except (ValidationError, Exception) as e: error(e)
+    save_history_entries(done)
+    if failed: sys.exit(1)
 
 @cli.command("history")
-@click.option("-l", "--limit", type=int)
+@click.option("-l", "--limit", type=click.IntRange(min=1))
 @click.option("--clear", is_flag=True)
-def history_cmd(limit, clear):
+@click.option("--json", "as_json", is_flag=True, help="Print entries as indented JSON, oldest first.")
+def history_cmd(limit, clear, as_json):
     """View or clear generation history."""
     if clear:
-        if HISTORY_FILE.exists(): HISTORY_FILE.unlink()
+        for f in (HISTORY_FILE, LEGACY_HISTORY_FILE, LEGACY_HISTORY_BACKUP): f.unlink(missing_ok=True)
         click.secho("✓ History cleared", fg="green")
         return
-    if not HISTORY_FILE.exists():
+    entries = load_history(limit)
+    if as_json:
+        click.echo(json.dumps(entries, indent=2, ensure_ascii=False))
+        return
+    if not entries:
         click.echo("No history found.")
         return
-    entries = json.loads(HISTORY_FILE.read_text()).get("entries", [])[-limit if limit else len(entries):]
-    for i, e in enumerate(reversed(entries), 1):
-        click.echo(f"[{i}] {e.get('time', '')[:19]} - {e.get('type')}\n    {e.get('command')}\n")
+    click.echo(format_history(entries), nl=False)
+
+def _fast_shape(cmd):
+    """(argument name, {flag: param name}, {param name: choices or None}, required names) for commands
+    taking one string argument plus string/choice options without defaults; None for anything else."""
+    args = [p for p in cmd.params if isinstance(p, click.Argument)]
+    opts = [p for p in cmd.params if isinstance(p, click.Option)]
+    if len(args) != 1 or args[0].nargs != 1 or args[0].type is not click.STRING: return None
+    if any(o.is_flag or o.multiple or o.nargs != 1 or o.to_info_dict()["default"] is not None  # Click 8.2+: UNSET
+           or not (o.type is click.STRING or isinstance(o.type, click.Choice)) for o in opts): return None
+    flags = {f: o.name for o in opts for f in o.opts + o.secondary_opts}
+    choices = {o.name: getattr(o.type, "choices", None) for o in opts}
+    return args[0].name, flags, choices, tuple(o.name for o in opts if o.required)
+
+_FAST_SHAPES = {name: shape for name, cmd in cli.commands.items() if (shape := _fast_shape(cmd))}
+
+def _fast_parse(argv):
+    """Parse the common invocation shapes by hand; None means "let Click handle it"."""
+    if not argv: return None
+    if argv[0] == "history":
+        kwargs = {"limit": None, "clear": False, "as_json": False}
+        it = iter(argv[1:])
+        for tok in it:
+            if tok == "--clear": kwargs["clear"] = True
+            elif tok == "--json": kwargs["as_json"] = True
+            elif tok in ("-l", "--limit"):
+                val = next(it, None)
+                if val is None or not val.isdecimal() or int(val) < 1: return None
+                kwargs["limit"] = int(val)
+            else: return None
+        return kwargs
+    if argv[0] not in _FAST_SHAPES: return None
+    positional, flags, choices, required = _FAST_SHAPES[argv[0]]
+    kwargs = dict.fromkeys(choices)
+    value = None
+    it = iter(argv[1:])
+    for tok in it:
+        name = flags.get(tok)
+        if name:
+            val = next(it, None)
+            if val is None or kwargs[name] is not None: return None
+            if choices[name] is not None and val not in choices[name]: return None
+            kwargs[name] = val
+        elif tok.startswith("-") or value is not None: return None
+        else: value = tok
+    if value is None or any(kwargs[name] is None for name in required): return None
+    kwargs[positional] = value
+    return kwargs
+
+def main():
+    """Console entry point: run common shapes directly and fall back to Click for everything else."""
+    argv = sys.argv[1:]
+    kwargs = _fast_parse(argv)
+    if kwargs is None: return cli()
+    cli.commands[argv[0]].callback(**kwargs)
 
-if __name__ == "__main__": cli()
+if __name__ == "__main__": main()